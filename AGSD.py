@@ -1,13 +1,18 @@
 import argparse
+import asyncio
+import concurrent.futures
+import itertools
 import json
 import os
 import sys
-import uuid
-import time
+from dataclasses import dataclass
+from pathlib import Path
 try:
-    import requests
+    import orjson
 except Exception:
-    requests = None
+    orjson = None
+
+from jira_client import IssueCache, JiraClient, build_dry_run_session, build_session
 
 # -------------------------
 # 1. CONFIGURATION / CLI
@@ -19,6 +24,11 @@ parser.add_argument("--token", help="JIRA API token")
 parser.add_argument("--board", help="Board ID (integer)")
 parser.add_argument("--project", help="Project key (e.g. SCRUM)", default="SCRUM")
 parser.add_argument("--dry-run", help="Run without calling Jira (simulate)", action="store_true")
+parser.add_argument("--attach", help="Files to attach to the first story (e.g. UI screenshots)", nargs="*", default=[])
+parser.add_argument("--report", help="Write the created issue keys and sprints to this JSON file")
+parser.add_argument("--state", help="SQLite file remembering created issues so a rerun skips them (ignored with --dry-run)")
+parser.add_argument("--http2", help="Multiplex requests over HTTP/2 (needs: pip install 'httpx[http2]')", action="store_true")
+parser.add_argument("--concurrency", help="Max Jira requests in flight at once", type=int, default=8)
 args = parser.parse_args()
 
 JIRA_DOMAIN = args.domain or os.getenv("JIRA_DOMAIN")
@@ -27,170 +37,88 @@ JIRA_API_TOKEN = args.token or os.getenv("JIRA_API_TOKEN")
 BOARD_ID = int(args.board) if args.board else (int(os.getenv("BOARD_ID")) if os.getenv("BOARD_ID") else None)
 PROJECT_KEY = args.project or os.getenv("PROJECT_KEY") or "SCRUM"
 DRY_RUN = args.dry_run
+CONCURRENCY = max(1, args.concurrency)
+HTTP2 = args.http2 and not DRY_RUN
+
+
+def _write_json(path, obj):
+    """Write obj to path as indented JSON in one call, closing the file deterministically."""
+    if orjson is not None:
+        data = orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+    else:
+        data = json.dumps(obj, indent=2, ensure_ascii=False).encode("utf-8")
+    Path(path).write_bytes(data)
+
+
+def _existing_files(paths):
+    """Return the paths that name regular files, with one scandir per parent directory instead of a stat per path."""
+    listings = {}
+    for d in {os.path.dirname(p) or "." for p in paths}:
+        try:
+            with os.scandir(d) as entries:
+                listings[d] = {e.name for e in entries if e.is_file()}
+        except OSError:
+            listings[d] = set()
+    present = []
+    for p in paths:
+        if os.path.basename(p) in listings[os.path.dirname(p) or "."]:
+            present.append(p)
+        else:
+            print(f"Attachment not found, skipping: {p}")
+    return present
 
-HEADERS = {"Content-Type": "application/json", "Accept": "application/json"}
 
 if not DRY_RUN and not (JIRA_DOMAIN and JIRA_EMAIL and JIRA_API_TOKEN):
     print("Missing Jira configuration. Provide --domain,--email,--token or run with --dry-run to simulate.")
     sys.exit(1)
 
-# Prepare a requests.Session or a MockSession for dry-run
-class MockResponse:
-    def __init__(self, status_code=201, payload=None):
-        self.status_code = status_code
-        self._payload = payload or {}
-
-    def json(self):
-        return self._payload
-
-class MockSession:
-    def __init__(self):
-        self._epic_counter = 1
-        self._issue_counter = 1
-
-    def post(self, url, json=None, headers=None):
-        # Simulate create issue and sprint endpoints
-        payload = {}
-        if "/rest/api/3/issue" in url:
-            key = f"DEMO-{self._issue_counter}"
-            self._issue_counter += 1
-            payload = {"key": key, "id": str(uuid.uuid4())}
-            return MockResponse(201, payload)
-        if "/rest/agile/1.0/sprint" in url:
-            payload = {"id": self._epic_counter}
-            self._epic_counter += 1
-            return MockResponse(201, payload)
-        # default
-        return MockResponse(200, {})
-
-    def get(self, url, params=None):
-        return MockResponse(200, {})
-
-    def put(self, url, json=None, headers=None):
-        return MockResponse(204, {})
-
-if DRY_RUN:
-    session = MockSession()
-    print("Running in dry-run mode: no Jira API calls will be performed.")
-else:
-    if requests is None:
-        print("The 'requests' library is required when not running in dry-run mode. Install with: pip install requests")
-        sys.exit(1)
-    session = requests.Session()
-    session.auth = (JIRA_EMAIL, JIRA_API_TOKEN)
-    session.headers.update(HEADERS)
-
-
-# -------------------------
-# 2. CREATE EPIC
-# -------------------------
-def create_epic(summary, description):
-    url = f"https://{JIRA_DOMAIN}/rest/api/3/issue"
-
-    payload = {
-        "fields": {
-            "project": {"key": PROJECT_KEY},
-            "summary": summary,
-            "description": description,
-            "issuetype": {"name": "Epic"},
-            # Epic Name custom field may vary by instance; common keys include customfield_10014/10011
-        }
-    }
-
-    r = session.post(url, json=payload)
-    if r is None or getattr(r, 'status_code', None) not in (200, 201):
-        print(f"Failed to create epic '{summary}':", getattr(r, 'status_code', None), getattr(r, 'text', ''))
-        return None
-    return r.json()
-
-
-# -------------------------
-# 3. CREATE USER STORY
-# -------------------------
-def create_story(summary, description, epic_key):
-    url = f"https://{JIRA_DOMAIN}/rest/api/3/issue"
-
-    payload = {
-        "fields": {
-            "project": {"key": PROJECT_KEY},
-            "summary": summary,
-            "description": description,
-            "issuetype": {"name": "Story"}
-        }
-    }
-
-    r = session.post(url, json=payload)
-    if r is None or getattr(r, 'status_code', None) not in (200, 201):
-        print(f"Failed to create story '{summary}':", getattr(r, 'status_code', None), getattr(r, 'text', ''))
-        return None
-    issue = r.json()
-    # linking to epic requires the Epic Link custom field id which varies by instance.
-    # We'll attempt to set it via a separate edit if epic_key is provided and we're not in dry-run.
-    if epic_key and not DRY_RUN:
-        # Try a best-effort update using a common field name 'customfield_10014' or 'customfield_10011'
-        link_fields = ["customfield_10014", "customfield_10011"]
-        for lf in link_fields:
-            upd = {"fields": {lf: epic_key}}
-            upd_r = session.put(f"{url}/{issue.get('key')}", json=upd)
-            if getattr(upd_r, 'status_code', None) in (200, 204):
-                break
-    return issue
-
-
-# -------------------------
-# 4. CREATE SUBTASK
-# -------------------------
-def create_subtask(summary, parent_story_key):
-    url = f"https://{JIRA_DOMAIN}/rest/api/3/issue"
-
-    payload = {
-        "fields": {
-            "project": {"key": PROJECT_KEY},
-            "summary": summary,
-            "issuetype": {"name": "Sub-task"},
-            "parent": {"key": parent_story_key}
-        }
-    }
+# Prepare a requests.Session, an HTTP/2 httpx.Client, or a mocked session for dry-run
+try:
+    if DRY_RUN:
+        session = build_dry_run_session()
+        print("Running in dry-run mode: no Jira API calls will be performed.")
+    else:
+        session = build_session(JIRA_EMAIL, JIRA_API_TOKEN, CONCURRENCY, http2=HTTP2)
+except RuntimeError as e:
+    print(e)
+    sys.exit(1)
 
-    r = session.post(url, json=payload)
-    if r is None or getattr(r, 'status_code', None) not in (200, 201):
-        print(f"Failed to create subtask '{summary}' for {parent_story_key}:", getattr(r, 'status_code', None))
-        return None
-    return r.json()
+cache = IssueCache(args.state) if args.state and not DRY_RUN else None
+client = JiraClient(session, JIRA_DOMAIN, PROJECT_KEY, BOARD_ID, cache=cache)
 
 
+@dataclass(slots=True)
+class Epic:
+    key: str
+    name: str
 
-# -------------------------
-# 5. CREATE SPRINTS
-# -------------------------
-def create_sprint(name, goal):
-    url = f"https://{JIRA_DOMAIN}/rest/agile/1.0/sprint"
 
-    payload = {"name": name, "originBoardId": BOARD_ID, "goal": goal}
-    r = session.post(url, json=payload)
-    if r is None or getattr(r, 'status_code', None) not in (200, 201):
-        print(f"Failed to create sprint '{name}':", getattr(r, 'status_code', None))
-        return None
-    return r.json()
+@dataclass(slots=True)
+class Story:
+    key: str
+    summary: str
+    points: int | None = None
 
 
 # -------------------------
-# 6. ADD ISSUE TO SPRINT
+# 2. RUN HELPERS CONCURRENTLY
 # -------------------------
-def assign_issue_to_sprint(sprint_id, issue_id):
-    url = f"https://{JIRA_DOMAIN}/rest/agile/1.0/sprint/{sprint_id}/issue"
+async def gather_bounded(fn, jobs):
+    """Run fn(*job) for every job on the worker pool installed by main().
 
-    payload = {"issues": [issue_id]}
-    r = session.post(url, json=payload)
-    if r is None:
-        return None
-    return getattr(r, 'status_code', None)
+    The pool has CONCURRENCY threads, which bounds the requests in flight.
+    Results are returned in job order so callers can zip them with their input.
+    """
+    return await asyncio.gather(*(asyncio.to_thread(fn, *job) for job in jobs))
 
 
 # ---------------------------------------------------------
-# 7. EXECUTE FULL IMPLEMENTATION
+# 3. EXECUTE FULL IMPLEMENTATION
 # ---------------------------------------------------------
-if __name__ == "__main__":
+async def main():
+    # asyncio.to_thread runs on the default executor; size it to the concurrency cap
+    asyncio.get_running_loop().set_default_executor(
+        concurrent.futures.ThreadPoolExecutor(max_workers=CONCURRENCY))
 
     # -----------------------------
     # EPICS
@@ -203,57 +131,77 @@ if __name__ == "__main__":
         ("User Profile & KYC", "Profile update and verification")
     ]
 
-    epic_keys = []
-    for e in epics:
-        res = create_epic(e[0], e[1])
+    # keyed by name, so a failed epic never shifts the references below onto another one
+    created_epics: dict[str, Epic] = {}
+    for e, res in zip(epics, await gather_bounded(client.create_epic, epics)):
         if res and res.get("key"):
-            epic_keys.append(res["key"])
+            created_epics[e[0]] = Epic(res["key"], e[0])
             print("Created EPIC:", res["key"])
         else:
             print("Failed to create epic:", e[0])
 
+    def epic_key(name):
+        epic = created_epics.get(name)
+        return epic.key if epic else None
+
 
     # -----------------------------
     # USER STORIES
     # -----------------------------
     stories_data = [
-        ("Send Money using UPI", "User should be able to transfer money", epic_keys[0]),
-        ("Recharge Mobile", "User can recharge prepaid mobile", epic_keys[0]),
-        ("Login with PIN", "User logs in using secure PIN", epic_keys[1]),
-        ("Enable Biometric Login", "Fingerprint login support", epic_keys[1]),
-        ("View Monthly Statement", "User can download monthly report", epic_keys[3]),
-        ("Update Profile Photo", "User uploads new photo", epic_keys[4])
+        ("Send Money using UPI", "User should be able to transfer money", epic_key("Payments System"), 5),
+        ("Recharge Mobile", "User can recharge prepaid mobile", epic_key("Payments System"), 3),
+        ("Login with PIN", "User logs in using secure PIN", epic_key("Security & Authentication"), 2),
+        ("Enable Biometric Login", "Fingerprint login support", epic_key("Security & Authentication"), 2),
+        ("View Monthly Statement", "User can download monthly report", epic_key("Transaction History"), 2),
+        ("Update Profile Photo", "User uploads new photo", epic_key("User Profile & KYC"), 1)
     ]
 
-    story_keys = []
-    for s in stories_data:
-        res = create_story(s[0], s[1], s[2])
+    # resolve the Story custom fields before the stories fan out so only one createmeta GET is made
+    await asyncio.to_thread(lambda: client.story_fields)
+
+    # the first 3 stories are planned for sprint 1 and the rest for sprint 2;
+    # each key is filed under its sprint as it comes back
+    created_stories: dict[str, Story] = {}
+    sprint1_keys, sprint2_keys = [], []
+    for i, (s, res) in enumerate(zip(stories_data, await gather_bounded(client.create_story, stories_data))):
         if res and res.get("key"):
-            story_keys.append(res["key"])
+            created_stories[s[0]] = Story(res["key"], s[0], s[3])
+            (sprint1_keys if i < 3 else sprint2_keys).append(res["key"])
             print("Created STORY:", res["key"])
         else:
             print("Failed to create story:", s[0])
 
+    attachments = _existing_files(args.attach)
+    first_story = created_stories.get(stories_data[0][0])
+    if attachments and first_story:
+        res = await asyncio.to_thread(client.add_attachments, first_story.key, attachments)
+        if res is not None:
+            print(f"Attached {len(res)} file(s) to {first_story.key}")
 
     # -----------------------------
     # SUBTASKS
     # -----------------------------
-    subtasks_data = [
-        ("Create UPI UI screen", story_keys[0]),
-        ("Validate UPI PIN", story_keys[0]),
-        ("Implement recharge API", story_keys[1]),
-        ("Recharge success UI", story_keys[1]),
-        ("Design PIN screen", story_keys[2]),
-        ("Test biometric unlock", story_keys[3]),
-        ("Generate PDF report", story_keys[4]),
-        ("Implement sorting", story_keys[4]),
-        ("Create upload endpoint", story_keys[5]),
-        ("Crop and resize image", story_keys[5])
-    ]
+    subtask_templates = {
+        "Send Money using UPI": ["Create UPI UI screen", "Validate UPI PIN"],
+        "Recharge Mobile": ["Implement recharge API", "Recharge success UI"],
+        "Login with PIN": ["Design PIN screen"],
+        "Enable Biometric Login": ["Test biometric unlock"],
+        "View Monthly Statement": ["Generate PDF report", "Implement sorting"],
+        "Update Profile Photo": ["Create upload endpoint", "Crop and resize image"],
+    }
 
-    for st in subtasks_data:
-        res = create_subtask(st[0], st[1])
+    # subtasks of different stories don't depend on each other, so flatten them into
+    # one (summary, parent_key) job list for a single bounded gather
+    subtasks_data = list(itertools.chain.from_iterable(
+        [(summary, story.key) for summary in subtask_templates.get(title, [])]
+        for title, story in created_stories.items()
+    ))
+
+    subtask_keys = []
+    for st, res in zip(subtasks_data, await gather_bounded(client.create_subtask, subtasks_data)):
         if res and res.get("key"):
+            subtask_keys.append(res["key"])
             print("Created SUBTASK:", res["key"])
         else:
             print("Failed to create subtask for:", st[1])
@@ -262,8 +210,10 @@ if __name__ == "__main__":
     # -----------------------------
     # SPRINTS
     # -----------------------------
-    sprint1 = create_sprint("Sprint 1", "Payments + Login")
-    sprint2 = create_sprint("Sprint 2", "Statements + Profile")
+    sprint1, sprint2 = await gather_bounded(client.create_sprint, [
+        ("Sprint 1", "Payments + Login"),
+        ("Sprint 2", "Statements + Profile"),
+    ])
 
     if sprint1 and sprint1.get("id"):
         print("Sprint 1 ID:", sprint1["id"])
@@ -274,16 +224,29 @@ if __name__ == "__main__":
     else:
         print("Sprint 2 creation failed")
 
-    # assign first 3 stories to sprint 1
-    if sprint1 and sprint1.get("id"):
-        for k in story_keys[:3]:
-            status = assign_issue_to_sprint(sprint1["id"], k)
-            print(f"Assign {k} to sprint {sprint1['id']}:", status)
+    # one request per sprint
+    assignments = []
+    if sprint1 and sprint1.get("id") and sprint1_keys:
+        assignments.append((sprint1["id"], sprint1_keys))
+    if sprint2 and sprint2.get("id") and sprint2_keys:
+        assignments.append((sprint2["id"], sprint2_keys))
+
+    for (sprint_id, keys), status in zip(assignments, await gather_bounded(client.add_issues_to_sprint, assignments)):
+        print(f"Assign {', '.join(keys)} to sprint {sprint_id}:", status)
+
+    if args.report:
+        _write_json(args.report, {
+            "epics": [e.key for e in created_epics.values()],
+            "stories": [{"key": s.key, "points": s.points} for s in created_stories.values()],
+            "subtasks": subtask_keys,
+            "sprints": [{"id": sprint_id, "issues": keys} for sprint_id, keys in assignments],
+        })
+        print("Report written to", args.report)
+
+    if cache is not None:
+        cache.close()
+    print("Done.")
 
-    # next 3 stories to sprint 2
-    if sprint2 and sprint2.get("id"):
-        for k in story_keys[3:]:
-            status = assign_issue_to_sprint(sprint2["id"], k)
-            print(f"Assign {k} to sprint {sprint2['id']}:", status)
 
-    print("Done.")
+if __name__ == "__main__":
+    asyncio.run(main())
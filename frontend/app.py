@@ -1,135 +1,301 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash
+from flask import Flask, render_template, stream_template, request, redirect, url_for, session, flash, g, get_flashed_messages
+from flask.helpers import get_debug_flag
+import hmac
+import logging
 import os
+import secrets
 import uuid
 from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from itsdangerous import BadSignature, TimestampSigner
+from jinja2 import FileSystemBytecodeCache
+
+from ratelimit import RedisTokenBucket, TokenBucket
+from store import MemoryStore, RedisStore
+
+log = logging.getLogger(__name__)
 
 app = Flask(__name__)
 app.secret_key = os.getenv("FRONTEND_SECRET", "dev-secret-key")
-
-# Simple in-memory demo stores (for local demo only)
-USERS = {}  # phone -> {phone, name, otp, bank, created_at}
-TRANSACTIONS = []  # list of {id, from_phone, to, amount, status, created_at}
+otp_signer = TimestampSigner(app.secret_key, salt="otp")
 
 BACKEND_URL = os.getenv("BACKEND_URL")  # if set, forms will POST to a real backend
+REDIS_URL = os.getenv("REDIS_URL")  # if set, users/transactions are shared through Redis
+JINJA_CACHE_DIR = os.getenv("JINJA_CACHE_DIR")  # if set, compiled templates are reused across restarts
+
+OTP_TTL = 300  # seconds a sent OTP stays valid
+# token buckets as (capacity, refill per second)
+OTP_PER_PHONE = (3, 1 / 60)
+OTP_PER_ADDR = (10, 10 / 60)
+VERIFY_PER_PHONE = (5, 1 / 60)
+SEND_PER_USER = (10, 1)
+MAX_AMOUNT = Decimal("1e7")  # exclusive
+MAX_AMOUNT_LEN = 20  # characters accepted before parsing
+CENT = Decimal("0.01")
+ANON_PAGE_TTL = 60  # seconds anonymous pages stay cached
+
+if JINJA_CACHE_DIR:
+    os.makedirs(JINJA_CACHE_DIR, exist_ok=True)
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(JINJA_CACHE_DIR)
+# Compile every template at startup instead of on the first request that renders it. Outside
+# debug mode Flask leaves auto_reload off, so these are never re-checked against the files.
+for template_name in app.jinja_env.list_templates():
+    app.jinja_env.get_template(template_name)
+
+# time-ordered ids on Python 3.14+, so each user's history stays sorted by id
+new_txn_id = getattr(uuid, "uuid7", uuid.uuid4)
+
+if REDIS_URL:
+    import redis
+
+    # one pool for the whole process, reused across requests
+    redis_pool = redis.ConnectionPool.from_url(REDIS_URL, decode_responses=True)
+    store = RedisStore(redis.Redis(connection_pool=redis_pool))
+    limiter = RedisTokenBucket(redis.Redis(connection_pool=redis_pool))
+
+    try:
+        from flask_session import Session
+    except ImportError:
+        Session = None
+    if Session is not None:
+        # Server-side sessions: the cookie only carries a session id and each request does one
+        # Redis GET instead of verifying a signed cookie. Flask-Session stores bytes, so it gets
+        # its own (non-decoding) client.
+        app.config.update(SESSION_TYPE="redis", SESSION_REDIS=redis.Redis.from_url(REDIS_URL))
+        Session(app)
+else:
+    # Simple in-memory demo store (for local demo only)
+    store = MemoryStore()
+    limiter = TokenBucket()
+
+try:
+    from flask_caching import Cache
+except ImportError:
+    Cache = None
+
+
+def personalised_request() -> bool:
+    # Only anonymous GETs render the same page for everyone; flashes are per-session and
+    # consumed by the render, so a page with pending flashes must be rendered afresh.
+    return request.method != "GET" or "phone" in session or "_flashes" in session
+
+
+if Cache is not None:
+    cache = Cache(app, config={"CACHE_TYPE": "SimpleCache"})
+    # query_string so /verify?phone=... is cached per phone
+    cache_anonymous = cache.cached(timeout=ANON_PAGE_TTL, query_string=True, unless=personalised_request)
+else:
+    def cache_anonymous(view):
+        return view
+
+
+def otp_allowed(phone: str) -> bool:
+    # per phone (SMS budget) and per client address (phone enumeration)
+    return limiter.allow(f"otp:{phone}", *OTP_PER_PHONE) and limiter.allow(f"otp-ip:{request.remote_addr}", *OTP_PER_ADDR)
+
 
+def current_user():
+    # looked up at most once per request; None when nobody is logged in
+    if "_user" not in g:
+        phone = session.get("phone")
+        g._user = (store.get_user(phone) or {"phone": phone}) if phone else None
+    return g._user
 
-def send_otp(phone: str):
-    # Demo: generate numeric OTP and store
-    otp = str(uuid.uuid4().int % 1000000).zfill(6)
-    USERS.setdefault(phone, {})["otp"] = otp
+
+@app.context_processor
+def inject_current_user():
+    # the function rather than its result, so pages that never show the user don't look it up
+    return {"current_user": current_user}
+
+
+def now_iso():
+    # one timestamp per request, shared by every record the request writes
+    if "_now" not in g:
+        g._now = datetime.utcnow().isoformat()
+    return g._now
+
+
+def parse_amount(text):
+    """Parse a transfer amount: positive, under MAX_AMOUNT and at most two decimal places. None if invalid."""
+    # checked before parsing so oversized input never reaches Decimal
+    if text is None or len(text) > MAX_AMOUNT_LEN:
+        return None
+    try:
+        value = Decimal(text)
+        if 0 < value < MAX_AMOUNT and value == value.quantize(CENT):
+            return value.quantize(CENT)
+    except InvalidOperation:  # malformed text, or NaN in a comparison
+        pass
+    return None
+
+
+def otp_digest(phone: str, otp: str) -> str:
+    return hmac.new(app.secret_key.encode(), f"{phone}:{otp}".encode(), "sha256").hexdigest()
+
+
+def send_otp(phone: str) -> str:
+    """Generate an OTP for `phone` and return the signed token that /verify checks it against.
+
+    Nothing is stored: the token carries the phone and a keyed digest of the OTP (never the
+    OTP itself, since signed tokens are readable) and expires after OTP_TTL seconds.
+    """
+    otp = f"{secrets.randbelow(1_000_000):06d}"
     # In production: call SMS provider
-    print(f"[demo] OTP for {phone}: {otp}")
-    return otp
+    log.info("[demo] OTP for %s: %s", phone, otp)
+    return otp_signer.sign(f"{phone}:{otp_digest(phone, otp)}").decode()
+
+
+def check_otp(token, phone, otp) -> bool:
+    try:
+        signed = otp_signer.unsign(token or "", max_age=OTP_TTL).decode()
+    except BadSignature:  # also raised for expired tokens
+        return False
+    signed_phone, _, digest = signed.rpartition(":")
+    return signed_phone == phone and otp is not None and hmac.compare_digest(digest, otp_digest(phone, otp))
 
 
 @app.route("/")
+@cache_anonymous
 def index():
-    user = None
-    if "phone" in session:
-        user = USERS.get(session["phone"]) or {"phone": session["phone"]}
-    return render_template("index.html", user=user)
+    return render_template("index.html", user=current_user())
 
 
 @app.route("/signup", methods=["GET", "POST"])
+@cache_anonymous
 def signup():
     if request.method == "POST":
-        phone = request.form.get("phone")
-        name = request.form.get("name") or ""
+        f = request.form
+        phone, name = f.get("phone"), f.get("name", "")
         if not phone:
             flash("Phone is required", "error")
-            return redirect(url_for("signup"))
-        USERS[phone] = {"phone": phone, "name": name, "created_at": datetime.utcnow().isoformat()}
-        send_otp(phone)
+            return redirect(URLS["signup"])
+        if not otp_allowed(phone):
+            flash("Too many OTP requests, try again later", "error")
+            return redirect(URLS["signup"])
+        store.save_user(phone, {"phone": phone, "name": name, "created_at": now_iso()})
+        token = send_otp(phone)
         flash("OTP sent (check console in demo)", "info")
-        return redirect(url_for("verify", phone=phone))
+        return redirect(url_for("verify", phone=phone, token=token))
     return render_template("signup.html")
 
 
 @app.route("/verify", methods=["GET", "POST"])
+@cache_anonymous
 def verify():
-    phone = request.args.get("phone") or request.form.get("phone")
     if request.method == "POST":
-        phone = request.form.get("phone")
-        otp = request.form.get("otp")
-        user = USERS.get(phone)
-        if user and user.get("otp") == otp:
+        f = request.form
+        phone, otp, token = f.get("phone"), f.get("otp"), f.get("token")
+        if not limiter.allow(f"verify:{phone}", *VERIFY_PER_PHONE):
+            flash("Too many attempts, try again later", "error")
+        elif check_otp(token, phone, otp):
             session["phone"] = phone
             flash("Logged in", "success")
-            return redirect(url_for("index"))
-        flash("Invalid OTP", "error")
-        return redirect(url_for("verify", phone=phone))
-    return render_template("verify.html", phone=phone)
+            return redirect(URLS["index"])
+        else:
+            flash("Invalid OTP", "error")
+        return redirect(url_for("verify", phone=phone, token=token))
+    args = request.args
+    return render_template("verify.html", phone=args.get("phone"), token=args.get("token"))
 
 
 @app.route("/logout")
 def logout():
     session.pop("phone", None)
     flash("Logged out", "info")
-    return redirect(url_for("index"))
+    return redirect(URLS["index"])
 
 
 @app.route("/link-bank", methods=["GET", "POST"])
 def link_bank():
     if "phone" not in session:
-        return redirect(url_for("login"))
+        return redirect(URLS["login"])
     phone = session["phone"]
     if request.method == "POST":
-        vpa = request.form.get("vpa")
-        bank = request.form.get("bank")
+        f = request.form
+        vpa, bank = f.get("vpa"), f.get("bank")
         if not vpa:
             flash("VPA or account required", "error")
-            return redirect(url_for("link_bank"))
-        USERS.setdefault(phone, {})["bank"] = {"vpa": vpa, "bank": bank, "verified": True}
+            return redirect(URLS["link_bank"])
+        store.update_user(phone, bank={"vpa": vpa, "bank": bank, "verified": True})
         flash("Bank linked (demo verified)", "success")
-        return redirect(url_for("index"))
-    return render_template("link_bank.html", user=USERS.get(session["phone"]))
+        return redirect(URLS["index"])
+    return render_template("link_bank.html", user=current_user())
 
 
 @app.route("/send", methods=["GET", "POST"])
 def send_money():
     if "phone" not in session:
-        return redirect(url_for("login"))
+        return redirect(URLS["login"])
     phone = session["phone"]
     if request.method == "POST":
-        to = request.form.get("to")
-        amount = request.form.get("amount")
-        try:
-            amount_val = float(amount)
-        except Exception:
-            flash("Invalid amount", "error")
-            return redirect(url_for("send_money"))
-        txn = {"id": str(uuid.uuid4()), "from": phone, "to": to, "amount": amount_val, "status": "SUCCESS", "created_at": datetime.utcnow().isoformat()}
-        TRANSACTIONS.append(txn)
+        if not limiter.allow(f"send:{phone}", *SEND_PER_USER):
+            flash("Too many transfers, slow down", "error")
+            return redirect(URLS["send_money"])
+        f = request.form
+        to, amount_val = f.get("to"), parse_amount(f.get("amount"))
+        if not to or amount_val is None:
+            flash("Invalid recipient or amount", "error")
+            return redirect(URLS["send_money"])
+        created_at = now_iso()
+        txn = {"id": new_txn_id().hex, "from": phone, "to": to, "amount": str(amount_val), "status": "SUCCESS", "created_at": created_at,
+               # formatted once here rather than on every /history render
+               "display_amount": f"{amount_val:,.2f}", "display_time": created_at[:19].replace("T", " ")}
+        store.add_transaction(txn)
         flash(f"Transaction {txn['id']} created (demo)", "success")
-        return redirect(url_for("history"))
+        return redirect(URLS["history"])
     return render_template("send.html")
 
 
 @app.route("/history")
 def history():
     if "phone" not in session:
-        return redirect(url_for("login"))
+        return redirect(URLS["login"])
     phone = session["phone"]
-    user_txns = [t for t in TRANSACTIONS if t["from"] == phone or t["to"] == phone]
-    return render_template("history.html", txns=user_txns)
+    user_txns = store.transactions_for(phone)
+    # The page is streamed row by row, so the session is saved before base.html pops the
+    # flashes; popping them now lets the cookie/session record that they were shown.
+    get_flashed_messages()
+    return stream_template("history.html", txns=user_txns)
 
 
 @app.route("/login", methods=["GET", "POST"])
+@cache_anonymous
 def login():
     if request.method == "POST":
         phone = request.form.get("phone")
         if not phone:
             flash("Phone required", "error")
-            return redirect(url_for("login"))
-        if phone not in USERS:
+            return redirect(URLS["login"])
+        if not store.has_user(phone):
             flash("Unknown phone. Please signup first.", "error")
-            return redirect(url_for("signup"))
-        send_otp(phone)
-        return redirect(url_for("verify", phone=phone))
+            return redirect(URLS["signup"])
+        if not otp_allowed(phone):
+            flash("Too many OTP requests, try again later", "error")
+            return redirect(URLS["login"])
+        token = send_otp(phone)
+        return redirect(url_for("verify", phone=phone, token=token))
     return render_template("login.html")
 
 
+# Endpoints without URL arguments always build the same URL, so build them once for redirects
+with app.test_request_context():
+    URLS = {rule.endpoint: url_for(rule.endpoint) for rule in app.url_map.iter_rules() if not rule.arguments}
+
+
 if __name__ == "__main__":
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
     host = os.getenv("FRONTEND_HOST", "127.0.0.1")
     port = int(os.getenv("FRONTEND_PORT", 5000))
-    app.run(host=host, port=port, debug=True)
+    if get_debug_flag():
+        # FLASK_DEBUG=1: Werkzeug dev server with reloader and debugger
+        app.run(host=host, port=port, debug=True)
+    else:
+        try:
+            from waitress import serve
+        except ImportError:
+            serve = None
+        if serve is not None:
+            serve(app, host=host, port=port, threads=8)
+        else:
+            app.run(host=host, port=port)
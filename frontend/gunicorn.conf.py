@@ -0,0 +1,25 @@
+# Gunicorn settings for serving the demo frontend: `gunicorn -c gunicorn.conf.py app:app`
+# Requires `pip install gunicorn gevent`. The gevent worker monkey-patches sockets itself,
+# so a request waiting on BACKEND_URL or Redis yields to other requests instead of holding a worker.
+import logging
+import logging.handlers
+import os
+import queue
+
+bind = f"{os.getenv('FRONTEND_HOST', '127.0.0.1')}:{os.getenv('FRONTEND_PORT', 5000)}"
+worker_class = "gevent"
+worker_connections = int(os.getenv("WORKER_CONNECTIONS", 1000))
+# The in-memory store is per process, so more than one worker needs REDIS_URL
+workers = int(os.getenv("WEB_CONCURRENCY", 4 if os.getenv("REDIS_URL") else 1))
+
+
+def post_worker_init(worker):
+    # Log records are handed to a queue and written to stderr by a listener, so a request
+    # logging an OTP never waits on stderr. Set LOG_LEVEL=WARNING to drop the demo OTP lines.
+    records = queue.SimpleQueue()
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s [%(process)d] %(levelname)s %(name)s: %(message)s"))
+    logging.handlers.QueueListener(records, handler).start()
+    root = logging.getLogger()
+    root.addHandler(logging.handlers.QueueHandler(records))
+    root.setLevel(os.getenv("LOG_LEVEL", "INFO"))
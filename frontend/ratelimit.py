@@ -0,0 +1,55 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """In-process token buckets: each key holds up to `capacity` tokens, refilled at `rate` tokens/second."""
+
+    # buckets that have refilled completely are dropped once this many keys are tracked
+    PRUNE_AT = 10_000
+
+    def __init__(self):
+        self._buckets = {}  # key -> (tokens, last_refill, full_at)
+        self._lock = threading.Lock()
+
+    def allow(self, key, capacity, rate):
+        now = time.monotonic()
+        with self._lock:
+            tokens, last, _ = self._buckets.get(key, (capacity, now, now))
+            tokens = min(capacity, tokens + (now - last) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now, now + (capacity - tokens) / rate)
+            if len(self._buckets) > self.PRUNE_AT:
+                self._buckets = {k: b for k, b in self._buckets.items() if b[2] > now}
+        return allowed
+
+
+class RedisTokenBucket:
+    """Token buckets shared by every worker process, updated atomically by a Lua script."""
+
+    _SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local last = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - last) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil((capacity - tokens) / rate) + 1)
+return allowed
+"""
+
+    def __init__(self, client):
+        self._allow = client.register_script(self._SCRIPT)
+
+    def allow(self, key, capacity, rate):
+        # wall-clock time, since monotonic clocks aren't comparable across processes
+        return bool(self._allow(keys=[f"ratelimit:{key}"], args=[capacity, rate, time.time()]))
@@ -0,0 +1,112 @@
+import json
+import threading
+from collections import defaultdict, deque
+
+from cachetools import LRUCache
+
+
+class MemoryStore:
+    """In-process users/transactions store (local demo only; each worker process has its own copy).
+
+    Memory is bounded: the least recently used users and the oldest transactions are
+    dropped once ``max_users``/``max_transactions`` is reached.
+    """
+
+    def __init__(self, max_users=100_000, max_transactions=1_000_000):
+        self.users = LRUCache(maxsize=max_users)  # phone -> {phone, name, bank, created_at}
+        self.max_transactions = max_transactions
+        self.transactions = deque()  # {id, from, to, amount, status, created_at}, oldest first
+        self.by_phone = defaultdict(deque)  # phone -> that phone's transactions, sent or received
+        # Writes touch several containers and LRUCache reorders itself even on reads, so all
+        # access must not interleave under threaded/gevent workers or free-threaded CPython
+        self._lock = threading.Lock()
+
+    def get_user(self, phone):
+        with self._lock:
+            return self.users.get(phone)
+
+    def has_user(self, phone):
+        with self._lock:
+            return phone in self.users
+
+    def save_user(self, phone, user):
+        with self._lock:
+            self.users[phone] = user
+
+    def update_user(self, phone, **fields):
+        with self._lock:
+            self.users.setdefault(phone, {}).update(fields)
+
+    def add_transaction(self, txn):
+        with self._lock:
+            if len(self.transactions) >= self.max_transactions:
+                self._drop_oldest()
+            self.transactions.append(txn)
+            for phone in {txn["from"], txn["to"]}:
+                self.by_phone[phone].append(txn)
+
+    def _drop_oldest(self):
+        # the oldest transaction is also the oldest entry in each of its phones' histories
+        old = self.transactions.popleft()
+        for phone in {old["from"], old["to"]}:
+            history = self.by_phone[phone]
+            history.popleft()
+            if not history:
+                del self.by_phone[phone]
+
+    def transactions_for(self, phone):
+        # a copy, since the history may change while the caller iterates it; .get so that
+        # looking up a phone with no history doesn't add an empty entry
+        with self._lock:
+            return list(self.by_phone.get(phone, ()))
+
+
+class RedisStore:
+    """Redis-backed store shared by every worker process.
+
+    Users live in a hash per phone (``user:<phone>``). Each transaction is
+    appended to the global ``txns`` list and to the sender's and recipient's
+    ``txns:<phone>`` lists, so history is a single LRANGE.
+    """
+
+    def __init__(self, client):
+        # client must be created with decode_responses=True
+        self.r = client
+
+    @staticmethod
+    def _encode(fields):
+        # hash values are flat strings; nested values (the linked bank) are stored as JSON
+        return {k: json.dumps(v) if isinstance(v, dict) else v for k, v in fields.items() if v is not None}
+
+    def get_user(self, phone):
+        user = self.r.hgetall(f"user:{phone}")
+        if not user:
+            return None
+        if "bank" in user:
+            user["bank"] = json.loads(user["bank"])
+        return user
+
+    def has_user(self, phone):
+        return bool(self.r.exists(f"user:{phone}"))
+
+    def save_user(self, phone, user):
+        key = f"user:{phone}"
+        pipe = self.r.pipeline()
+        pipe.delete(key)
+        pipe.hset(key, mapping=self._encode(user))
+        pipe.execute()
+
+    def update_user(self, phone, **fields):
+        self.r.hset(f"user:{phone}", mapping=self._encode(fields))
+
+    def add_transaction(self, txn):
+        data = json.dumps(txn)
+        pipe = self.r.pipeline()
+        pipe.rpush("txns", data)
+        pipe.rpush(f"txns:{txn['from']}", data)
+        if txn["to"] != txn["from"]:
+            pipe.rpush(f"txns:{txn['to']}", data)
+        pipe.execute()
+
+    def transactions_for(self, phone):
+        return [json.loads(t) for t in self.r.lrange(f"txns:{phone}", 0, -1)]
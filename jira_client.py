@@ -0,0 +1,393 @@
+import functools
+import hashlib
+import itertools
+import json
+import os
+import re
+import sqlite3
+import threading
+import uuid
+try:
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util import Retry
+    from urllib3.util.request import ACCEPT_ENCODING
+except Exception:
+    requests = None
+try:
+    import requests_mock
+except Exception:
+    requests_mock = None
+try:
+    from requests_toolbelt.multipart.encoder import MultipartEncoder
+except Exception:
+    MultipartEncoder = None
+try:
+    import httpx
+except Exception:
+    httpx = None
+try:
+    import msgspec
+except Exception:
+    msgspec = None
+try:
+    import orjson
+except Exception:
+    orjson = None
+try:
+    import zstandard
+except Exception:
+    zstandard = None
+
+# Content-Type is sent per request rather than on the session so multipart uploads can set their own
+HEADERS = {"Accept": "application/json"}
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+# urllib3 (and so requests) only negotiates zstd when it can import its own zstd backend,
+# while httpx uses the zstandard package directly. When only zstandard is available the
+# requests session advertises zstd itself and JiraClient._json inflates those bodies.
+_MANUAL_ZSTD = zstandard is not None and requests is not None and "zstd" not in ACCEPT_ENCODING
+
+
+# One encoder for the whole run; msgspec encoders are reusable and thread-safe
+_encoder = msgspec.json.Encoder() if msgspec is not None else None
+
+
+def _dump(payload):
+    """Serialize a request body to compact JSON bytes with msgspec or orjson, whichever is installed."""
+    if _encoder is not None:
+        return _encoder.encode(payload)
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+# -------------------------
+# 1. SESSIONS
+# -------------------------
+def _mock_attachments(request, context):
+    body = request.body
+    if hasattr(body, "to_string"):  # streamed MultipartEncoder
+        body = body.to_string()
+    return [{"filename": name.decode()} for name in re.findall(rb'filename="([^"]*)"', body or b"")]
+
+
+def build_dry_run_session():
+    """Create a requests.Session whose https:// traffic is answered by a requests_mock adapter.
+
+    Dry runs go through the same client code and HTTP semantics as real runs,
+    with fake DEMO-n issue keys and sprint ids.
+    """
+    if requests is None or requests_mock is None:
+        raise RuntimeError("The 'requests' and 'requests-mock' libraries are required for --dry-run. Install with: pip install requests requests-mock")
+    # itertools.count keeps the fake keys unique when helpers run on worker threads
+    issue_ids = itertools.count(1)
+    sprint_ids = itertools.count(1)
+
+    adapter = requests_mock.Adapter()
+    adapter.register_uri("POST", re.compile(r"/rest/api/3/issue$"), status_code=201,
+                         json=lambda req, ctx: {"key": f"DEMO-{next(issue_ids)}", "id": str(uuid.uuid4())})
+    adapter.register_uri("PUT", re.compile(r"/rest/api/3/issue/[^/]+$"), status_code=204)
+    adapter.register_uri("GET", re.compile(r"/rest/api/3/issue/createmeta"), json={"projects": []})
+    adapter.register_uri("POST", re.compile(r"/rest/api/3/issue/[^/]+/attachments$"), json=_mock_attachments)
+    adapter.register_uri("POST", re.compile(r"/rest/agile/1.0/sprint$"), status_code=201,
+                         json=lambda req, ctx: {"id": next(sprint_ids)})
+    adapter.register_uri("POST", re.compile(r"/rest/agile/1.0/sprint/\d+/issue$"), status_code=204)
+
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    session.mount("https://", adapter)
+    return session
+
+
+def build_session(email, api_token, concurrency=8, http2=False):
+    """Create an authenticated requests.Session, or an HTTP/2 httpx.Client when http2 is set.
+
+    Raises RuntimeError naming the package to install when the needed client library is missing.
+    """
+    if http2:
+        if httpx is None:
+            raise RuntimeError("The 'httpx' library is required for --http2. Install with: pip install 'httpx[http2]'")
+        # All calls share one multiplexed connection. httpx only retries failed connects;
+        # the 429/Retry-After backoff below is specific to the requests session.
+        return httpx.Client(
+            auth=(email, api_token),
+            headers=HEADERS,
+            transport=httpx.HTTPTransport(
+                http2=True, retries=3,
+                limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)),
+        )
+
+    if requests is None:
+        raise RuntimeError("The 'requests' library is required when not running in dry-run mode. Install with: pip install requests")
+    session = requests.Session()
+    session.auth = (email, api_token)
+    session.headers.update(HEADERS)
+    if _MANUAL_ZSTD:
+        session.headers["Accept-Encoding"] = "zstd, gzip, deflate"
+    # One pooled keep-alive connection per worker thread instead of urllib3's default 10.
+    # Requests go out at full speed; only a 429/5xx reply backs off, honouring Retry-After.
+    retry = Retry(total=5, backoff_factor=0.5, status_forcelist=[429, 502, 503, 504],
+                  allowed_methods=["POST", "PUT", "GET"], respect_retry_after_header=True,
+                  raise_on_status=False)
+    session.mount("https://", HTTPAdapter(pool_connections=16, pool_maxsize=max(16, concurrency),
+                                          max_retries=retry))
+    return session
+
+
+if MultipartEncoder is not None:
+    class _RewindableEncoder(MultipartEncoder):
+        """Streaming multipart body that urllib3 can rewind when the Retry policy replays the POST."""
+
+        def tell(self):
+            # only asked before the first read, to record where a retry should restart
+            return 0
+
+        def seek(self, pos):
+            for _, (_, f, _) in self.fields:
+                f.seek(0)
+            self.__init__(self.fields, boundary=self.boundary_value, encoding=self.encoding)
+
+
+# -------------------------
+# 2. CREATED-ISSUE CACHE
+# -------------------------
+class IssueCache:
+    """SQLite map from an issue's identity (project, type, summary, ...) to the key Jira gave it.
+
+    A rerun after a partial failure looks issues up here instead of creating
+    duplicates. Rows are committed as they are written so a crash loses nothing.
+    """
+
+    def __init__(self, path):
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._db:
+            self._db.execute("CREATE TABLE IF NOT EXISTS issues(h INTEGER PRIMARY KEY, key TEXT NOT NULL)")
+
+    @staticmethod
+    def _hash(parts):
+        # blake2b rather than an optional hash library, so the ids stay stable whatever is installed
+        digest = hashlib.blake2b("|".join(parts).encode("utf-8"), digest_size=8).digest()
+        return int.from_bytes(digest, "big", signed=True)
+
+    def get(self, *parts):
+        with self._lock:
+            row = self._db.execute("SELECT key FROM issues WHERE h=?", (self._hash(parts),)).fetchone()
+        return row[0] if row else None
+
+    def put(self, key, *parts):
+        with self._lock, self._db:
+            self._db.execute("INSERT OR REPLACE INTO issues(h, key) VALUES (?, ?)", (self._hash(parts), key))
+
+    def close(self):
+        self._db.close()
+
+
+# -------------------------
+# 3. JIRA CLIENT
+# -------------------------
+class JiraClient:
+    """Epic/Story/Subtask/Sprint helpers for one Jira project, shared by the AGSD entry points.
+
+    Methods are safe to call from worker threads; they print a message and
+    return None when Jira rejects a request.
+    """
+
+    def __init__(self, session, domain, project_key, board_id=None, cache=None):
+        self.session = session
+        self.project_key = project_key
+        self.board_id = board_id
+        self.cache = cache
+
+        # Endpoints, built once rather than per call
+        self.issue_url = f"https://{domain}/rest/api/3/issue"
+        self.createmeta_url = f"{self.issue_url}/createmeta"
+        self.sprint_url = f"https://{domain}/rest/agile/1.0/sprint"
+
+        # httpx takes raw bytes as content=, requests as data=
+        self._body_kw = "content" if httpx is not None and isinstance(session, httpx.Client) else "data"
+
+    def _json_body(self, payload):
+        """Request kwargs carrying payload as a JSON body."""
+        return {self._body_kw: _dump(payload), "headers": JSON_HEADERS}
+
+    @staticmethod
+    def _json(r):
+        """Decode a JSON response, inflating zstd bodies that requests left compressed."""
+        if _MANUAL_ZSTD and isinstance(r, requests.Response) and r.headers.get("Content-Encoding") == "zstd":
+            return json.loads(zstandard.ZstdDecompressor().decompressobj().decompress(r.content))
+        return r.json()
+
+    def _cached_issue(self, *parts):
+        """{"key": ...} for an issue created by an earlier run, or None."""
+        key = self.cache.get(self.project_key, *parts) if self.cache is not None else None
+        return {"key": key} if key else None
+
+    def _remember(self, issue, *parts):
+        if self.cache is not None and issue.get("key"):
+            self.cache.put(issue["key"], self.project_key, *parts)
+
+    # -------------------------
+    # EPICS
+    # -------------------------
+    def create_epic(self, summary, description):
+        cached = self._cached_issue("Epic", summary)
+        if cached:
+            return cached
+
+        payload = {
+            "fields": {
+                "project": {"key": self.project_key},
+                "summary": summary,
+                "description": description,
+                "issuetype": {"name": "Epic"},
+                # Epic Name custom field may vary by instance; common keys include customfield_10014/10011
+            }
+        }
+
+        r = self.session.post(self.issue_url, **self._json_body(payload))
+        if r.status_code not in (200, 201):
+            print(f"Failed to create epic '{summary}':", r.status_code, r.text)
+            return None
+        issue = self._json(r)
+        self._remember(issue, "Epic", summary)
+        return issue
+
+    # -------------------------
+    # USER STORIES
+    # -------------------------
+    @functools.cached_property
+    def story_fields(self):
+        """Map lowercased Story field names to their ids, fetched from createmeta once per client."""
+        params = {"projectKeys": self.project_key, "issuetypeNames": "Story", "expand": "projects.issuetypes.fields"}
+
+        r = self.session.get(self.createmeta_url, params=params)
+        if r.status_code != 200:
+            return {}
+        fields = {}
+        for project in self._json(r).get("projects", []):
+            for issuetype in project.get("issuetypes", []):
+                for field_id, field in issuetype.get("fields", {}).items():
+                    fields.setdefault(str(field.get("name", "")).lower(), field_id)
+        return fields
+
+    @property
+    def epic_link_field(self):
+        return self.story_fields.get("epic link") or self.story_fields.get("epic")
+
+    @property
+    def story_points_field(self):
+        return self.story_fields.get("story points") or self.story_fields.get("story point estimate")
+
+    def create_story(self, summary, description, epic_key, points=None):
+        cached = self._cached_issue("Story", summary)
+        if cached:
+            return cached
+
+        payload = {
+            "fields": {
+                "project": {"key": self.project_key},
+                "summary": summary,
+                "description": description,
+                "issuetype": {"name": "Story"}
+            }
+        }
+        # Story Points is a custom field too; only send it under the id createmeta reports
+        points_field = self.story_points_field if points is not None else None
+        if points_field:
+            payload["fields"][points_field] = points
+
+        r = self.session.post(self.issue_url, **self._json_body(payload))
+        if r.status_code not in (200, 201):
+            print(f"Failed to create story '{summary}':", r.status_code, r.text)
+            return None
+        issue = self._json(r)
+        # linking to epic requires the Epic Link custom field id which varies by instance,
+        # so it is set via a separate edit when epic_key is provided.
+        if epic_key:
+            # Use the field id resolved from createmeta; fall back to the common
+            # 'customfield_10014' / 'customfield_10011' ids when it isn't exposed.
+            link_field = self.epic_link_field
+            link_fields = [link_field] if link_field else ["customfield_10014", "customfield_10011"]
+            for lf in link_fields:
+                upd = {"fields": {lf: epic_key}}
+                upd_r = self.session.put(f"{self.issue_url}/{issue.get('key')}", **self._json_body(upd))
+                if upd_r.status_code in (200, 204):
+                    break
+        self._remember(issue, "Story", summary)
+        return issue
+
+    # -------------------------
+    # SUBTASKS
+    # -------------------------
+    def create_subtask(self, summary, parent_story_key):
+        cached = self._cached_issue("Sub-task", parent_story_key, summary)
+        if cached:
+            return cached
+
+        payload = {
+            "fields": {
+                "project": {"key": self.project_key},
+                "summary": summary,
+                "issuetype": {"name": "Sub-task"},
+                "parent": {"key": parent_story_key}
+            }
+        }
+
+        r = self.session.post(self.issue_url, **self._json_body(payload))
+        if r.status_code not in (200, 201):
+            print(f"Failed to create subtask '{summary}' for {parent_story_key}:", r.status_code)
+            return None
+        issue = self._json(r)
+        self._remember(issue, "Sub-task", parent_story_key, summary)
+        return issue
+
+    # -------------------------
+    # SPRINTS
+    # -------------------------
+    def create_sprint(self, name, goal):
+        payload = {"name": name, "originBoardId": self.board_id, "goal": goal}
+        r = self.session.post(self.sprint_url, **self._json_body(payload))
+        if r.status_code not in (200, 201):
+            print(f"Failed to create sprint '{name}':", r.status_code)
+            return None
+        return self._json(r)
+
+    def add_issues_to_sprint(self, sprint_id, issue_ids):
+        url = f"{self.sprint_url}/{sprint_id}/issue"
+
+        # the endpoint moves up to 50 issues per call
+        payload = {"issues": list(issue_ids)}
+        r = self.session.post(url, **self._json_body(payload))
+        return r.status_code
+
+    # -------------------------
+    # ATTACHMENTS
+    # -------------------------
+    def add_attachments(self, issue_key, filepaths):
+        url = f"{self.issue_url}/{issue_key}/attachments"
+
+        # Jira accepts several "file" parts in one multipart request, so every
+        # file goes up in a single POST instead of one round trip each.
+        # callers pass paths they have already checked exist
+        handles = []
+        try:
+            for p in filepaths:
+                handles.append((os.path.basename(p), open(p, "rb")))
+            if not handles:
+                return None
+            files = [("file", (name, f, "application/octet-stream")) for name, f in handles]
+            if MultipartEncoder is not None and isinstance(self.session, requests.Session):
+                # stream the files in chunks instead of buffering the whole multipart body in memory
+                body = _RewindableEncoder(fields=files)
+                r = self.session.post(url, data=body, headers={"X-Atlassian-Token": "no-check", "Content-Type": body.content_type})
+            else:
+                r = self.session.post(url, files=files, headers={"X-Atlassian-Token": "no-check"})
+        finally:
+            for _, f in handles:
+                f.close()
+        if r.status_code != 200:
+            print(f"Failed to add attachments to {issue_key}:", r.status_code, r.text)
+            return None
+        return self._json(r)